@@ -1,5 +1,16 @@
+import logging
 import serial
+import sys
 import time
+import queue
+import threading
+
+log = logging.getLogger(__name__)
+
+ASYNC_LOW_LATENCY = 1 << 13  # serial_struct.flags bit from linux/tty_flags.h
+
+# 'D' lights the red bulb (defective), 'I' the green one (intact).
+STATUS_COMMANDS = {"Defective": b'D', "Intact": b'I'}
 
 class ArduinoCommunication:
     def __init__(self, port='COM3', baud_rate=9600):
@@ -7,35 +18,100 @@ class ArduinoCommunication:
         self.baud_rate = baud_rate
         self.arduino = None
 
+        # Writes happen on a background thread so a full serial buffer never
+        # blocks the caller (the GUI thread).
+        self._q = queue.Queue(maxsize=8)
+        self._writer = threading.Thread(target=self._pump, daemon=True)
+        self._writer.start()
+
     def connect(self):
         try:
-            self.arduino = serial.Serial(self.port, self.baud_rate, timeout=1)
-            time.sleep(2)  # Allow time for Arduino to initialize
-            print(f"Connected to Arduino on {self.port}.")
+            # Writes already run on the writer thread; the short write timeout only
+            # keeps a wedged port from holding it indefinitely.
+            self.arduino = serial.Serial(self.port, self.baud_rate, timeout=1, write_timeout=0.5)
+            self.enable_low_latency()
+            self.wait_until_ready()
+            log.info("Connected to Arduino on %s.", self.port)
             return True
         except Exception as e:
-            print(f"Error connecting to Arduino: {e}")
+            log.error("Error connecting to Arduino: %s", e)
             return False
 
-    def send_defect_status(self, status):
+    def enable_low_latency(self):
         try:
-            if self.arduino and self.arduino.is_open:
-                if status == "Defective":
-                    print("Sending 'D' to Arduino for Defective")
-                    self.arduino.write(b'D')  # Send 'D' for Defective (red bulb)
-                elif status == "Intact":
-                    print("Sending 'I' to Arduino for Intact")
-                    self.arduino.write(b'I')  # Send 'I' for Intact (green bulb)
-                print(f"Sent status to Arduino: {status}")
-            else:
-                print("Arduino is not connected.")
+            if hasattr(self.arduino, "set_buffer_size"):
+                # Windows only: enlarge the driver's rx/tx queues.
+                self.arduino.set_buffer_size(rx_size=65536, tx_size=65536)
+            elif sys.platform.startswith("linux"):
+                # Same as `setserial <port> low_latency`: USB-serial drivers drop
+                # their latency timer (16 ms by default on FTDI) to 1 ms.
+                import fcntl
+                import struct
+                import termios
+
+                serial_info = bytearray(128)
+                fcntl.ioctl(self.arduino.fileno(), termios.TIOCGSERIAL, serial_info)
+                flags, = struct.unpack_from("i", serial_info, 16)
+                struct.pack_into("i", serial_info, 16, flags | ASYNC_LOW_LATENCY)
+                fcntl.ioctl(self.arduino.fileno(), termios.TIOCSSERIAL, serial_info)
         except Exception as e:
-            print(f"Error sending defect status: {e}")
+            log.warning("Could not enable low-latency mode on %s: %s", self.port, e)
+
+    def wait_until_ready(self, timeout=2):
+        # Opening the port resets the board. Return as soon as the sketch reports
+        # READY, otherwise fall back to waiting out the boot time.
+        deadline = time.monotonic() + timeout
+        self.arduino.timeout = 0.1
+        try:
+            while time.monotonic() < deadline:
+                if b"READY" in self.arduino.readline():
+                    break
+        finally:
+            self.arduino.timeout = 1
+
+    def _enqueue(self, item):
+        # Under backpressure drop the oldest command; only the latest status matters.
+        while True:
+            try:
+                self._q.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._q.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _pump(self):
+        while True:
+            command = self._q.get()
+            if command is None:
+                break
+            try:
+                if self.arduino and self.arduino.is_open:
+                    self.arduino.write(command)
+                    self.arduino.flush()
+                    log.debug("Sent %r to Arduino.", command)
+                else:
+                    log.warning("Arduino is not connected.")
+            except serial.SerialTimeoutException:
+                log.warning("Timed out sending %r to Arduino; command dropped.", command)
+            except Exception as e:
+                log.error("Error sending defect status: %s", e)
+
+    def send_byte(self, command):
+        self._enqueue(command)
+
+    def send_defect_status(self, status):
+        command = STATUS_COMMANDS.get(status)
+        if command is not None:
+            self.send_byte(command)
 
     def close(self):
+        self._enqueue(None)
+        self._writer.join(timeout=1)
         try:
             if self.arduino and self.arduino.is_open:
                 self.arduino.close()
-                print("Arduino connection closed.")
+                log.info("Arduino connection closed.")
         except Exception as e:
-            print(f"Error closing Arduino connection: {e}")
\ No newline at end of file
+            log.error("Error closing Arduino connection: %s", e)
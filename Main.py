@@ -2,8 +2,10 @@ import sys
 from PyQt5.QtWidgets import QApplication
 from app_ui import MainWindow
 import warnings
+import logging
 
 warnings.filterwarnings("ignore", category=FutureWarning)
+logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 
 def main():
     app = QApplication(sys.argv)
@@ -4,20 +4,79 @@ from PyQt5.QtWidgets import (
     QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox, QDialog
 )
 from PyQt5.QtGui import QPixmap, QImage
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
 import datetime
 import csv
+import collections
+import logging
+import sqlite3
 from detection import DetectionThread
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
-import matplotlib.pyplot as plt
-import traceback
+import numpy as np
 from database import Database  # Import the Database class
 from ArduinoCommunication import ArduinoCommunication
 
+log = logging.getLogger(__name__)
+
+# result -> (counter attribute, label attribute, label text, details, sorting message,
+#            Arduino command, is defective)
+_STATUS_TABLE = {
+    "Intact": (
+        "intact_count", "intact_label", "Intact Count",
+        "Box is intact and properly sealed.",
+        "✅ Intact box detected. Sorting to the intact side.",
+        b'I', False
+    ),
+    "Damaged-Deformed": (
+        "deformed_count", "deformed_label", "Damaged-Deformed Count",
+        "Box is deformed or punctured.",
+        "❌ Damaged-Deformed box detected. Sorting to the reject side.",
+        b'D', True
+    ),
+    "Damaged-Open": (
+        "open_count", "open_label", "Damaged-Open Count",
+        "Box is improperly sealed or open.",
+        "❌ Damaged-Open box detected. Sorting to the reject side.",
+        b'D', True
+    ),
+}
+
+
+class DetectionHistory:
+    def __init__(self, capacity=4096):
+        # Fixed-capacity ring buffers: memory stays bounded over long runs and
+        # matplotlib receives float64 arrays it can draw without conversion.
+        self.capacity = capacity
+        self._buf = {
+            "Intact": np.zeros(capacity),
+            "Damaged-Deformed": np.zeros(capacity),
+            "Damaged-Open": np.zeros(capacity)
+        }
+        self._xs = np.arange(1, capacity + 1, dtype=np.float64)
+        self.head = 0
+        self.y_max = 1
+
+    def append(self, new_data):
+        index = self.head % self.capacity
+        for key, buf in self._buf.items():
+            value = new_data.get(key, 0)
+            buf[index] = value
+            if value > self.y_max:
+                self.y_max = value
+        self.head += 1
+
+    def series(self, key):
+        buf = self._buf[key]
+        if self.head <= self.capacity:
+            return self._xs[:self.head], buf[:self.head]
+
+        # Buffer has wrapped: the oldest sample sits at the write head.
+        index = self.head % self.capacity
+        return self._xs + (self.head - self.capacity), np.concatenate((buf[index:], buf[:index]))
 
 class GraphWindow(QDialog):
-    def __init__(self, detection_data=None):
+    def __init__(self, history):
         super().__init__()
         try:
             self.setWindowTitle("Defect Detection Statistics")
@@ -31,101 +90,119 @@ class GraphWindow(QDialog):
             layout.addWidget(self.canvas)
             self.setLayout(layout)
 
-            self.detection_data = detection_data if detection_data else {
-                "Intact": [],
-                "Damaged-Deformed": [],
-                "Damaged-Open": []
-            }
-            self.time_steps = []
-
-            self.plot_data()
-        except Exception as e:
-            print(f"Error initializing GraphWindow: {e}")
-            traceback.print_exc()
-
-    def plot_data(self):
-        try:
-            self.ax.clear()
+            # Shared with MainWindow, which appends to it; the window only reads it.
+            self.history = history
 
-            max_length = max(
-                len(self.time_steps),
-                len(self.detection_data["Intact"]),
-                len(self.detection_data["Damaged-Deformed"]),
-                len(self.detection_data["Damaged-Open"])
+            # Lines are animated so that full redraws skip them; they are drawn
+            # on top of the cached background with blitting in plot_data.
+            self.line_intact, = self.ax.plot(
+                [], [], label="Intact (Good Boxes)", marker="o", color="green", linewidth=2, animated=True
             )
-
-            if len(self.time_steps) < max_length:
-                self.time_steps = list(range(1, max_length + 1))
-
-            has_data = False
-
-            if self.detection_data["Intact"]:
-                self.ax.plot(
-                    self.time_steps[:len(self.detection_data["Intact"])],
-                    self.detection_data["Intact"],
-                    label="Intact (Good Boxes)",
-                    marker="o",
-                    color="green",
-                    linewidth=2
-                )
-                has_data = True
-
-            if self.detection_data["Damaged-Deformed"]:
-                self.ax.plot(
-                    self.time_steps[:len(self.detection_data["Damaged-Deformed"])],
-                    self.detection_data["Damaged-Deformed"],
-                    label="Damaged-Deformed (Bad Boxes)",
-                    marker="s",
-                    color="red",
-                    linewidth=2
-                )
-                has_data = True
-
-            if self.detection_data["Damaged-Open"]:
-                self.ax.plot(
-                    self.time_steps[:len(self.detection_data["Damaged-Open"])],
-                    self.detection_data["Damaged-Open"],
-                    label="Damaged-Open (Bad Boxes)",
-                    marker="^",
-                    color="blue",
-                    linewidth=2
-                )
-                has_data = True
+            self.line_deformed, = self.ax.plot(
+                [], [], label="Damaged-Deformed (Bad Boxes)", marker="s", color="red", linewidth=2, animated=True
+            )
+            self.line_open, = self.ax.plot(
+                [], [], label="Damaged-Open (Bad Boxes)", marker="^", color="blue", linewidth=2, animated=True
+            )
+            self.lines = {
+                "Intact": self.line_intact,
+                "Damaged-Deformed": self.line_deformed,
+                "Damaged-Open": self.line_open
+            }
 
             self.ax.set_xlabel("Time Step", fontsize=12)
             self.ax.set_ylabel("Count", fontsize=12)
             self.ax.set_title("Defect Detection Over Time", fontsize=14, fontweight="bold")
 
-            plt.xticks(rotation=45, ha="right")
+            self.ax.tick_params(axis="x", labelrotation=45)
             self.ax.grid(True, linestyle="--", alpha=0.6)
 
-            if has_data:
-                self.ax.legend(
-                    loc="upper center",
-                    bbox_to_anchor=(0.5, 1.15),
-                    ncol=3,
-                    fontsize=10
-                )
-
+            self.ax.legend(
+                loc="upper center",
+                bbox_to_anchor=(0.5, 1.15),
+                ncol=3,
+                fontsize=10
+            )
+            self.ax.set_xlim(1, 10)
+            self.ax.set_ylim(0, 1.1)
             self.figure.tight_layout()
-            self.canvas.draw()
+
+            # Labels, grid and legend are drawn once into the cached background;
+            # any full redraw (first show, resize, limit change) re-caches it.
+            self.background = None
+            self.canvas.mpl_connect("draw_event", self.on_draw)
+
+            self.plot_data()
         except Exception as e:
-            print(f"Error plotting data: {e}")
-            traceback.print_exc()
+            log.exception("Error initializing GraphWindow: %s", e)
+
+    def on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.draw_lines()
+
+    def draw_lines(self):
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+
+    def rescale_axes(self):
+        capacity = self.history.capacity
+        x_max = max(self.history.head, 1)
+        y_max = self.history.y_max
+
+        x_min, x_limit = self.ax.get_xlim()
+        y_min, y_limit = self.ax.get_ylim()
+        if x_max <= x_limit and y_max <= y_limit:
+            return False
+
+        # Grow the limits geometrically so the full redraw happens rarely. Once
+        # the ring has wrapped, scroll the window a quarter of its width at a time.
+        if x_max > capacity:
+            x_min = x_max - capacity + 1
+            x_limit = x_max + capacity // 4
+        else:
+            while x_limit < x_max:
+                x_limit *= 2
+        while y_limit < y_max:
+            y_limit *= 2
+        self.ax.set_xlim(x_min, x_limit)
+        self.ax.set_ylim(y_min, y_limit)
+        return True
 
-    def update_data(self, new_data):
+    def plot_data(self):
         try:
-            for key in self.detection_data:
-                if key in new_data:
-                    self.detection_data[key].append(new_data[key])
-                else:
-                    self.detection_data[key].append(0)
+            for key, line in self.lines.items():
+                line.set_data(*self.history.series(key))
 
-            self.time_steps.append(len(self.time_steps) + 1)
-            self.plot_data()
+            if self.rescale_axes() or self.background is None:
+                # draw_event handler re-caches the background and draws the lines.
+                self.canvas.draw()
+                return
+
+            self.canvas.restore_region(self.background)
+            self.draw_lines()
+            self.canvas.blit(self.ax.bbox)
         except Exception as e:
-            print(f"Error updating data: {e}")
-            traceback.print_exc()
+            log.exception("Error plotting data: %s", e)
+
+class ReportExportThread(QThread):
+    log_message = pyqtSignal(str)
+
+    def __init__(self, db, file_path):
+        super().__init__()
+        self.db = db
+        self.file_path = file_path
+
+    def run(self):
+        try:
+            # Rows are streamed from the database straight into a 1 MiB file buffer.
+            with open(self.file_path, "w", newline="", buffering=1 << 20) as file:
+                writer = csv.writer(file)
+                writer.writerow(["Timestamp", "Status", "Details"])
+                writer.writerows(self.db.iter_all_results())
+            self.log_message.emit(f"✅ Report saved to {self.file_path}.")
+        except (OSError, sqlite3.Error) as e:
+            log.error("Error exporting report: %s", e)
+            self.log_message.emit(f"Error exporting report: {e}")
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -145,7 +222,14 @@ class MainWindow(QMainWindow):
             self.append_log("Failed to connect to Arduino.")
 
         self.graph_window = None
-        self.detection_data = {"Intact": [], "Damaged-Deformed": [], "Damaged-Open": []}
+        self.detection_history = DetectionHistory()
+
+        # Detections are counted here and pushed to the graph at 20 Hz, so the
+        # redraw rate does not follow the detection rate.
+        self._pending_plot = {"Intact": 0, "Damaged-Deformed": 0, "Damaged-Open": 0}
+        self._plot_timer = QTimer(self)
+        self._plot_timer.timeout.connect(self._flush_plot)
+        self._plot_timer.start(50)
 
 
         self.full_screen_mode = False
@@ -161,6 +245,14 @@ class MainWindow(QMainWindow):
         self.video_label.setAlignment(Qt.AlignCenter)
         self.main_layout.addWidget(self.video_label, stretch=8)
 
+        # Live frames are scaled with the cheap nearest-neighbour filter; once
+        # frames stop arriving the last one is re-rendered with smoothing.
+        self._last_pixmap = None
+        self._smooth_timer = QTimer(self)
+        self._smooth_timer.setSingleShot(True)
+        self._smooth_timer.setInterval(200)
+        self._smooth_timer.timeout.connect(self.render_smooth)
+
         self.stats_layout = QVBoxLayout()
 
         self.counter_layout = QHBoxLayout()
@@ -178,8 +270,16 @@ class MainWindow(QMainWindow):
         self.log_area.setReadOnly(True)
         self.log_area.setStyleSheet("background-color: #f1f1f1; font-size: 14px;")
         self.log_area.setFixedHeight(100)
+        self.log_area.document().setMaximumBlockCount(500)
         self.stats_layout.addWidget(self.log_area)
 
+        # Log lines are buffered and appended in one batch per timer tick. The
+        # view keeps only 500 blocks, so older buffered lines are dropped too.
+        self._log_buf = collections.deque(maxlen=500)
+        self._log_timer = QTimer(self)
+        self._log_timer.timeout.connect(self._flush_log)
+        self._log_timer.start(100)
+
         self.main_layout.addLayout(self.stats_layout, stretch=2)
 
         self.button_layout = QHBoxLayout()
@@ -197,9 +297,11 @@ class MainWindow(QMainWindow):
         self.table_widget.setHorizontalHeaderLabels(["Timestamp", "Status", "Details"])
         self.table_widget.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.table_widget.setFixedHeight(120)
+        self.max_table_rows = 200
         self.main_layout.addWidget(self.table_widget, stretch=2)
 
         self.detection_thread = None
+        self.export_thread = None
         self.total_count = 0
         self.intact_count = 0
         self.deformed_count = 0
@@ -213,76 +315,113 @@ class MainWindow(QMainWindow):
         button.clicked.connect(action)
         self.button_layout.addWidget(button)
 
-    def update_display(self, pixmap: QPixmap):
-        if pixmap:
-            scaled_pixmap = pixmap.scaled(self.video_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            self.video_label.setPixmap(scaled_pixmap)
+    def update_display(self, frame, bgr):
+        # The QImage is only a view of the frame's pixels; QPixmap.fromImage
+        # makes the one copy, here on the GUI thread where it is safe. Qt
+        # reads BGR directly, so no cvtColor is needed for display.
+        if frame is not None and frame.size:
+            height, width = frame.shape[:2]
+            image_format = QImage.Format_BGR888 if bgr else QImage.Format_RGB888
+            image = QImage(frame.data, width, height, frame.strides[0], image_format)
+            pixmap = QPixmap.fromImage(image)
+            self._last_pixmap = pixmap
+            self.show_scaled(pixmap, Qt.FastTransformation)
+            self._smooth_timer.start()
+
+    def render_smooth(self):
+        if self._last_pixmap:
+            self.show_scaled(self._last_pixmap, Qt.SmoothTransformation)
+
+    def show_scaled(self, pixmap, transformation):
+        # Skip the rescale entirely when the frame already has the target size.
+        size = self.video_label.size()
+        if pixmap.size().scaled(size, Qt.KeepAspectRatio) == pixmap.size():
+            self.video_label.setPixmap(pixmap)
+        else:
+            self.video_label.setPixmap(pixmap.scaled(size, Qt.KeepAspectRatio, transformation))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._smooth_timer.start()
 
-    def update_counters(self, result: str):
-        if result not in ["Intact", "Damaged-Deformed", "Damaged-Open"]:
+    def update_counters(self, results: dict):
+        for result, count in results.items():
+            for _ in range(count):
+                self.record_result(result)
+
+    def record_result(self, result: str):
+        row = _STATUS_TABLE.get(result)
+        if row is None:
             return
+        count_attr, label_attr, label_text, details, sorting_msg, arduino_command, is_defective = row
 
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        if result == "Intact":
-            self.intact_count += 1
-            details = "Box is intact and properly sealed."
-            sorting_msg = "✅ Intact box detected. Sorting to the intact side."
-            self.consecutive_defective_count = 0  # Reset only for intact objects
-            # Send signal to Arduino for green bulb
-            self.arduino.send_defect_status("Intact")
-        elif result == "Damaged-Deformed":
-            self.deformed_count += 1
-            details = "Box is deformed or punctured."
-            sorting_msg = "❌ Damaged-Deformed box detected. Sorting to the reject side."
-            self.consecutive_defective_count += 1
-            # Send signal to Arduino for red bulb
-            self.arduino.send_defect_status("Defective")
-        else:
-            self.open_count += 1
-            details = "Box is improperly sealed or open."
-            sorting_msg = "❌ Damaged-Open box detected. Sorting to the reject side."
-            self.consecutive_defective_count += 1
-            # Send signal to Arduino for red bulb
-            self.arduino.send_defect_status("Defective")
+        now = datetime.datetime.now()
+        timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
+
+        # 'I' lights the green bulb, 'D' the red one.
+        self.arduino.send_byte(arduino_command)
 
+        count = getattr(self, count_attr) + 1
+        setattr(self, count_attr, count)
         self.total_count += 1
+        # Only intact objects reset the consecutive defect run.
+        self.consecutive_defective_count = self.consecutive_defective_count + 1 if is_defective else 0
 
-        print(f"Consecutive Defective Count: {self.consecutive_defective_count}")
+        log.debug("Consecutive Defective Count: %d", self.consecutive_defective_count)
 
         self.total_label.setText(f"Total Count: {self.total_count}")
-        self.intact_label.setText(f"Intact Count: {self.intact_count}")
-        self.deformed_label.setText(f"Damaged-Deformed Count: {self.deformed_count}")
-        self.open_label.setText(f"Damaged-Open Count: {self.open_count}")
+        getattr(self, label_attr).setText(f"{label_text}: {count}")
 
         self.append_log(sorting_msg)
 
+        self.table_widget.setUpdatesEnabled(False)
         row_position = self.table_widget.rowCount()
         self.table_widget.insertRow(row_position)
         self.table_widget.setItem(row_position, 0, QTableWidgetItem(timestamp))
         self.table_widget.setItem(row_position, 1, QTableWidgetItem(result))
         self.table_widget.setItem(row_position, 2, QTableWidgetItem(details))
+        # Older detections stay in the database; the table only shows recent ones.
+        if self.table_widget.rowCount() > self.max_table_rows:
+            self.table_widget.removeRow(0)
+        self.table_widget.setUpdatesEnabled(True)
 
         # Insert data into the database
-        self.db.insert_result(timestamp, result, details)
+        self.db.insert_result(now, result, details)
 
-        self.detection_data[result].append(1)
-        if self.graph_window:
-            self.graph_window.update_data({result: 1})
+        self._pending_plot[result] += 1
 
         if self.consecutive_defective_count >= 10:
-            print("Triggering warning message...")
+            log.info("Triggering warning message...")
             self.show_warning_message()
             self.stop_detection()
             self.consecutive_defective_count = 0  # Reset the count after stopping detection
 
+    def _flush_plot(self):
+        if not any(self._pending_plot.values()):
+            return
+
+        self.detection_history.append(self._pending_plot)
+        if self.graph_window and self.graph_window.isVisible():
+            self.graph_window.plot_data()
+
+        for key in self._pending_plot:
+            self._pending_plot[key] = 0
+
     def show_warning_message(self):
         warning_msg = "Warning: 10 consecutive defective items detected. Detection has been stopped."
         QMessageBox.warning(self, "Defect Detection Warning", warning_msg)
 
     def append_log(self, message: str):
-        self.log_area.append(message)
-        self.log_area.verticalScrollBar().setValue(self.log_area.verticalScrollBar().maximum())
+        self._log_buf.append(message)
+
+    def _flush_log(self):
+        if not self._log_buf:
+            return
+
+        batch = "\n".join(self._log_buf)
+        self._log_buf.clear()
+        # append() keeps the view pinned to the bottom if it already was.
+        self.log_area.append(batch)
 
     def start_webcam_detection(self):
         self.start_detection(source=0)
@@ -317,25 +456,26 @@ class MainWindow(QMainWindow):
             self.detection_thread.toggle_pause()
 
     def export_report(self):
+        # Replacing a running export thread would destroy it mid-run.
+        if self.export_thread and self.export_thread.isRunning():
+            self.append_log("A report export is already in progress.")
+            return
+
         file_path, _ = QFileDialog.getSaveFileName(self, "Save Report", "", "CSV Files (*.csv)")
         if file_path:
-            # Fetch all data from the database
-            results = self.db.fetch_all_results()
-            with open(file_path, "w", newline="") as file:
-                writer = csv.writer(file)
-                writer.writerow(["Timestamp", "Status", "Details"])
-                for row in results:
-                    writer.writerow(row)  # Write the timestamp, status, and details
-            self.append_log(f"✅ Report saved to {file_path}.")
+            self.export_thread = ReportExportThread(self.db, file_path)
+            self.export_thread.log_message.connect(self.append_log)
+            self.export_thread.start()
 
     def open_graph_window(self):
         try:
             if not self.graph_window:
-                self.graph_window = GraphWindow(self.detection_data)
+                self.graph_window = GraphWindow(self.detection_history)
             self.graph_window.show()
+            # Catch up on samples recorded while the window was hidden.
+            self.graph_window.plot_data()
         except Exception as e:
-            print(f"Error opening graph window: {e}")
-            traceback.print_exc()
+            log.exception("Error opening graph window: %s", e)
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_F11:
@@ -349,6 +489,9 @@ class MainWindow(QMainWindow):
             super().keyPressEvent(event)
 
     def closeEvent(self, event):
-        # Close the database connection when the application is closed
+        # Close the database and Arduino connections when the application is closed
+        if self.export_thread:
+            self.export_thread.wait()
         self.db.close()
+        self.arduino.close()
         event.accept()
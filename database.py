@@ -1,8 +1,44 @@
+import logging
 import sqlite3
 import os
-from datetime import datetime
+import queue
+import threading
+
+log = logging.getLogger(__name__)
 
 class Database:
+    # Statements are class constants so the sqlite3 statement cache compiles
+    # each of them once per connection.
+    _SQL_INSERT = """
+    INSERT INTO detection_results (timestamp, year, month, week, status, details)
+    VALUES (?, ?, ?, ?, ?, ?);
+    """
+
+    _SQL_SUMMARY = """
+    INSERT INTO defect_summary (date, year, month, week, total_count, intact_count, damaged_deformed_count, damaged_open_count)
+    VALUES (?, ?, ?, ?, 1, ?, ?, ?)
+    ON CONFLICT(date) DO UPDATE SET
+        total_count = total_count + 1,
+        intact_count = intact_count + excluded.intact_count,
+        damaged_deformed_count = damaged_deformed_count + excluded.damaged_deformed_count,
+        damaged_open_count = damaged_open_count + excluded.damaged_open_count;
+    """
+
+    # A period is a month name, so a new year restarts its counts.
+    _SQL_TRENDS = """
+    INSERT INTO defect_trends (period, year, month, week, total_defects, intact_count, damaged_deformed_count, damaged_open_count)
+    VALUES (?, ?, ?, ?, 1, ?, ?, ?)
+    ON CONFLICT(period) DO UPDATE SET
+        year = excluded.year,
+        week = CASE WHEN year = excluded.year THEN week ELSE excluded.week END,
+        total_defects = CASE WHEN year = excluded.year THEN total_defects ELSE 0 END + 1,
+        intact_count = CASE WHEN year = excluded.year THEN intact_count ELSE 0 END + excluded.intact_count,
+        damaged_deformed_count = CASE WHEN year = excluded.year THEN damaged_deformed_count ELSE 0 END
+            + excluded.damaged_deformed_count,
+        damaged_open_count = CASE WHEN year = excluded.year THEN damaged_open_count ELSE 0 END
+            + excluded.damaged_open_count;
+    """
+
     def __init__(self, db_name="QualiScanDB.db", db_directory=None):
         if db_directory:
             if not os.path.exists(db_directory):
@@ -11,9 +47,18 @@ class Database:
         else:
             self.db_path = db_name
 
-        self.conn = sqlite3.connect(self.db_path)
+        # Autocommit mode on both connections: every transaction is an explicit
+        # BEGIN IMMEDIATE ... COMMIT, so each one costs a single sync.
+        self.conn = sqlite3.connect(self.db_path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
         self.create_tables()
-        print(f"Database initialized. File path: {self.db_path}")
+
+        # Results are queued by the GUI thread and written by a background
+        # thread that owns its own connection, one transaction per batch.
+        self._q = queue.Queue()
+        self._writer = threading.Thread(target=self._run, daemon=True)
+        self._writer.start()
+        log.info("Database initialized. File path: %s", self.db_path)
 
     def create_tables(self):
         create_queries = [
@@ -51,92 +96,110 @@ class Database:
                 damaged_deformed_count INTEGER NOT NULL,
                 damaged_open_count INTEGER NOT NULL
             );
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_dr_timestamp ON detection_results (timestamp DESC);
             """
         ]
 
         try:
+            self.conn.execute("BEGIN IMMEDIATE")
             for query in create_queries:
                 self.conn.execute(query)
-            self.conn.commit()
-            print("Tables created or updated with missing columns.")
+            self.conn.execute("COMMIT")
+            log.debug("Tables created or updated with missing columns.")
         except sqlite3.Error as e:
-            print(f"Error creating or altering tables: {e}")
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+            log.error("Error creating or altering tables: %s", e)
 
-    def insert_result(self, timestamp, status, details):
-        date_obj = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
-        year = date_obj.strftime("%Y")
-        month = date_obj.strftime("%B")
-        week = date_obj.strftime("%Y-%W")
+    def insert_result(self, dt, status, details):
+        if not self._writer.is_alive():
+            log.error("Database writer is not running; result dropped.")
+            return
+        self._q.put((dt, status, details))
 
-        query = """
-        INSERT INTO detection_results (timestamp, year, month, week, status, details)
-        VALUES (?, ?, ?, ?, ?, ?);
-        """
-        try:
-            self.conn.execute(query, (timestamp, year, month, week, status, details))
-            self.conn.commit()
-            print(f"Inserted result: {timestamp}, {status}, {details}")
-
-            date = date_obj.strftime("%Y-%m-%d")
-            self.update_defect_summary(date, year, month, week)
-            self.update_defect_trends(date, year, month, week)
-        except sqlite3.Error as e:
-            print(f"Error inserting result: {e}")
+    def flush(self):
+        # Block until the writer has committed everything queued so far, and
+        # fail instead of waiting forever if the writer thread has died.
+        with self._q.all_tasks_done:
+            while self._q.unfinished_tasks:
+                if not self._writer.is_alive():
+                    raise sqlite3.OperationalError("Database writer is not running.")
+                self._q.all_tasks_done.wait(timeout=0.5)
 
-    def update_defect_summary(self, date, year, month, week):
-        query = """
-        INSERT INTO defect_summary (date, year, month, week, total_count, intact_count, damaged_deformed_count, damaged_open_count)
-        SELECT
-            DATE(timestamp) AS date,
-            ? AS year,
-            ? AS month,
-            ? AS week,
-            COUNT(*) AS total_count,
-            SUM(CASE WHEN status = 'Intact' THEN 1 ELSE 0 END) AS intact_count,
-            SUM(CASE WHEN status = 'Damaged-Deformed' THEN 1 ELSE 0 END) AS damaged_deformed_count,
-            SUM(CASE WHEN status = 'Damaged-Open' THEN 1 ELSE 0 END) AS damaged_open_count
-        FROM detection_results
-        WHERE DATE(timestamp) = ?
-        GROUP BY DATE(timestamp)
-        ON CONFLICT(date) DO UPDATE SET
-            total_count = excluded.total_count,
-            intact_count = excluded.intact_count,
-            damaged_deformed_count = excluded.damaged_deformed_count,
-            damaged_open_count = excluded.damaged_open_count;
-        """
+    def _run(self):
         try:
-            self.conn.execute(query, (year, month, week, date))
-            self.conn.commit()
-            print(f"Updated defect_summary for date: {date}")
+            self.write_conn = sqlite3.connect(self.db_path, isolation_level=None, cached_statements=256)
+            self.write_conn.execute("PRAGMA synchronous=NORMAL;")
+            self.write_conn.execute("PRAGMA temp_store=MEMORY;")
         except sqlite3.Error as e:
-            print(f"Error updating defect_summary: {e}")
+            log.error("Error starting database writer: %s", e)
+            return
+
+        running = True
+        while running:
+            batch = [self._q.get()]
+            while True:
+                try:
+                    batch.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+
+            rows = [item for item in batch if item is not None]
+            running = len(rows) == len(batch)
+            try:
+                if rows:
+                    self._write_batch(rows)
+            except Exception:
+                log.exception("Error writing results")
+            finally:
+                for _ in batch:
+                    self._q.task_done()
+
+        self.write_conn.close()
+
+    def _write_batch(self, results):
+        rows = []
+        for dt, status, details in results:
+            timestamp = dt.strftime("%Y-%m-%d %H:%M:%S")
+            year = timestamp[:4]
+            month = dt.strftime("%B")
+            week = dt.strftime("%Y-%W")
+            date = timestamp[:10]
+            rows.append((timestamp, year, month, week, status, details, date))
 
-    def update_defect_trends(self, date, year, month, week):
-        query = """
-        INSERT INTO defect_trends (period, year, month, week, total_defects, intact_count, damaged_deformed_count, damaged_open_count)
-        SELECT
-            ? AS period,
-            ? AS year,
-            ? AS month,
-            ? AS week,
-            COUNT(*) AS total_defects,
-            SUM(CASE WHEN status = 'Intact' THEN 1 ELSE 0 END) AS intact_count,
-            SUM(CASE WHEN status = 'Damaged-Deformed' THEN 1 ELSE 0 END) AS damaged_deformed_count,
-            SUM(CASE WHEN status = 'Damaged-Open' THEN 1 ELSE 0 END) AS damaged_open_count
-        FROM detection_results
-        WHERE strftime('%Y-%m', timestamp) = strftime('%Y-%m', ?)
-        ON CONFLICT(period) DO UPDATE SET
-            total_defects = excluded.total_defects,
-            intact_count = excluded.intact_count,
-            damaged_deformed_count = excluded.damaged_deformed_count,
-            damaged_open_count = excluded.damaged_open_count;
-        """
         try:
-            self.conn.execute(query, (month, year, month, week, date))
-            self.conn.commit()
-            print(f"Updated defect_trends for period: {month}")
+            # IMMEDIATE takes the write lock up front instead of upgrading mid-transaction.
+            self.write_conn.execute("BEGIN IMMEDIATE")
+            self.write_conn.executemany(self._SQL_INSERT, [row[:6] for row in rows])
+
+            # Bump the aggregate rows in place instead of recounting the table.
+            summary_rows = []
+            trend_rows = []
+            for timestamp, year, month, week, status, details, date in rows:
+                flags = (int(status == "Intact"), int(status == "Damaged-Deformed"), int(status == "Damaged-Open"))
+                summary_rows.append((date, year, month, week) + flags)
+                trend_rows.append((month, year, month, week) + flags)
+            self.update_defect_summary(summary_rows)
+            self.update_defect_trends(trend_rows)
+
+            self.write_conn.execute("COMMIT")
+            log.debug("Inserted %d results.", len(rows))
         except sqlite3.Error as e:
-            print(f"Error updating defect_trends: {e}")
+            if self.write_conn.in_transaction:
+                self.write_conn.execute("ROLLBACK")
+            log.error("Error inserting results: %s", e)
+
+    # Both run inside _write_batch's transaction; errors propagate so the
+    # whole batch is rolled back together with the inserted rows.
+    def update_defect_summary(self, rows):
+        self.write_conn.executemany(self._SQL_SUMMARY, rows)
+        log.debug("Updated defect_summary with %d results.", len(rows))
+
+    def update_defect_trends(self, rows):
+        self.write_conn.executemany(self._SQL_TRENDS, rows)
+        log.debug("Updated defect_trends with %d results.", len(rows))
 
     def fetch_all_results(self):
         query = """
@@ -145,17 +208,36 @@ class Database:
         ORDER BY timestamp DESC;
         """
         try:
+            self.flush()
             cursor = self.conn.cursor()
             cursor.execute(query)
             results = cursor.fetchall()
             return results
         except sqlite3.Error as e:
-            print(f"Error fetching results: {e}")
+            log.error("Error fetching results: %s", e)
             return []
 
+    def iter_all_results(self):
+        query = """
+        SELECT timestamp, status, details
+        FROM detection_results
+        ORDER BY timestamp DESC;
+        """
+        self.flush()
+        # A private connection lets this run on any thread; under WAL it does
+        # not block the writer while the rows are streamed out. Errors reach
+        # the caller, so a truncated export is not reported as complete.
+        conn = sqlite3.connect(self.db_path)
+        try:
+            yield from conn.execute(query)
+        finally:
+            conn.close()
+
     def close(self):
+        self._q.put(None)
+        self._writer.join()
         try:
             self.conn.close()
-            print("Database connection closed.")
+            log.info("Database connection closed.")
         except sqlite3.Error as e:
-            print(f"Error closing database: {e}")
\ No newline at end of file
+            log.error("Error closing database: %s", e)
\ No newline at end of file
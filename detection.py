@@ -1,38 +1,180 @@
+import os
 import cv2
+import numpy as np
 from PyQt5.QtCore import QThread, pyqtSignal
-from PyQt5.QtGui import QImage, QPixmap
 from ultralytics import YOLO
 import torch
+import torch.nn.functional as F
 import time
-import traceback
+import queue
+import threading
+import logging
+
+log = logging.getLogger(__name__)
+
+# Letterboxed model input for the 800x600 frames, rounded up to the stride of 32.
+MODEL_IMGSZ = (608, 800)
+
+# Indexed by model class id; colors are RGB.
+CLASS_NAMES = ["Damaged-Open", "Damaged-Deformed", "Intact"]
+CLASS_COLORS = [(255, 0, 0), (0, 0, 255), (0, 255, 0)]
+LINE_COLOR = (0, 255, 255)
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+# Video summaries are aggregated over this many frames.
+SUMMARY_INTERVAL = 10
+
+# Engines that failed to load are not retried for the rest of the session.
+_failed_engines = set()
+# Compiled models by (model_path, batch_size), reused by every later run;
+# None marks a failed compile.
+_compiled_models = {}
+
+
+def engine_path(model_path, batch_size):
+    # The engine's input shape is fixed, so batch size and image size are part
+    # of its name.
+    stem = os.path.splitext(model_path)[0]
+    return f"{stem}_b{batch_size}_{MODEL_IMGSZ[0]}x{MODEL_IMGSZ[1]}.engine"
+
+
+def export_engine(model_path, batch_size=8):
+    # Builds the TensorRT FP16 engine DetectionThread uses on CUDA. This takes
+    # minutes and Ultralytics may install onnx/tensorrt, so it is a separate
+    # step, see export_engine.py.
+    start_time = time.time()
+    exported = YOLO(model_path).export(
+        format="engine", half=True, imgsz=MODEL_IMGSZ,
+        batch=batch_size, dynamic=False, verbose=False
+    )
+    path = engine_path(model_path, batch_size)
+    os.replace(exported, path)
+    log.info("Built TensorRT engine %s in %.1fs.", path, time.time() - start_time)
+    return path
 
 class DetectionThread(QThread):
-    frame_processed = pyqtSignal(QPixmap)
-    detection_result = pyqtSignal(str)
+    # (frame, bgr): the annotated ndarray goes to the GUI thread as is and is
+    # wrapped in a QImage there, so the only copy is the QPixmap upload.
+    frame_processed = pyqtSignal(object, bool)
+    detection_result = pyqtSignal(dict)
     log_message = pyqtSignal(str)
     detection_summary = pyqtSignal(dict)
     warning_signal = pyqtSignal(str)
     pause_trigger = pyqtSignal(str)
 
-    def __init__(self, source, model_path, confidence=0.5, frame_skip=1):
+    def __init__(self, source, model_path, confidence=0.5, frame_skip=1, batch_size=8,
+                 class_names=CLASS_NAMES, colors=CLASS_COLORS):
         super().__init__()
         self.source = source
+        self.model_path = model_path
+        self.class_names = list(class_names)
+        self.colors = list(colors)
         self.confidence = confidence
         self.frame_skip = frame_skip
+        self.batch_size = batch_size
         self.running = False
-        self.paused = False
+        # Set while running; the reader blocks on it instead of spinning when paused.
+        self._pause_event = threading.Event()
+        self._pause_event.set()
         self.consecutive_damaged_count = 0
         self.line_y_position = None
-        self.tracked_objects = {}
+        # Objects seen in the previous frame, keyed by box center x (sorted),
+        # with the bottom edge recorded when first seen or last crossing.
+        self._track_ids = np.empty(0, dtype=np.int32)
+        self._track_y2 = np.empty(0, dtype=np.int32)
+        # Font, scale and thickness never change, so label boxes are measured once.
+        self._label_sizes = {
+            name: cv2.getTextSize(f"{name}: 0.00", FONT, 0.5, 1)[0]
+            for name in self.class_names
+        }
+        # Webcams and network streams produce frames in real time; stale ones are dropped.
+        self.is_live = not isinstance(source, str) or source.lower().startswith(("rtsp://", "rtmp://", "http://", "https://"))
+        self.fixed_batch_size = None
+        self.pre_stream = None
+        self.pinned = None
 
         try:
             self.device = "cuda" if torch.cuda.is_available() else "cpu"
             self.model = YOLO(model_path)
+            self.predict_args = {
+                "conf": self.confidence,
+                "device": self.device,
+                "agnostic_nms": True,
+                "verbose": False,
+            }
+            # Without CUDA, OpenCV's transparent API can still run the
+            # resize and color conversion on an OpenCL device (usually an iGPU).
+            self.use_opencl = self.device == "cpu" and cv2.ocl.haveOpenCL() and cv2.ocl.useOpenCL()
+            if self.device == "cuda":
+                # Input shapes are fixed, so let cuDNN pick the fastest kernels once.
+                torch.backends.cudnn.benchmark = True
+                torch.cuda.set_device(0)
+                self.pre_stream = torch.cuda.Stream()
             self.log_message.emit(f"Model loaded successfully on {self.device}.")
         except Exception as e:
             self.model = None
             self.log_message.emit(f"Error loading YOLO model: {e}")
 
+    def load_engine(self):
+        # Only loads an engine built beforehand with export_engine.py; building
+        # one here would stall Start (and Stop) for minutes.
+        path = engine_path(self.model_path, self.batch_size)
+        if path in _failed_engines or not os.path.exists(path):
+            return False
+        if os.path.getmtime(path) < os.path.getmtime(self.model_path):
+            log.warning("TensorRT engine %s is older than %s; re-run export_engine.py.", path, self.model_path)
+            _failed_engines.add(path)
+            return False
+
+        torch_model = self.model
+        try:
+            self.model = YOLO(path, task="detect")
+            self.predict_args["imgsz"] = MODEL_IMGSZ
+            self.fixed_batch_size = self.batch_size
+            # Ultralytics only opens the engine on the first predict, so a missing
+            # tensorrt package or an engine built for another GPU shows up here.
+            self.predict(torch.zeros((self.batch_size, 3) + MODEL_IMGSZ, device=self.device))
+            self.log_message.emit("Using TensorRT engine.")
+            return True
+        except Exception as e:
+            self.model = torch_model
+            self.predict_args.pop("imgsz", None)
+            self.fixed_batch_size = None
+            _failed_engines.add(path)
+            log.warning("TensorRT engine unavailable, using the PyTorch model: %s", e)
+            return False
+
+    def compile_model(self):
+        # Without a TensorRT engine, compile the PyTorch network instead. It runs
+        # on the detection thread, once per session: later runs reuse the model.
+        key = (self.model_path, self.batch_size)
+        if key in _compiled_models:
+            if _compiled_models[key] is not None:
+                self.model = _compiled_models[key]
+                self.fixed_batch_size = self.batch_size
+            return
+        if not hasattr(torch, "compile"):
+            return
+        _compiled_models[key] = None
+        start_time = time.time()
+        warmup = torch.zeros((self.batch_size, 3) + MODEL_IMGSZ, device=self.device)
+        backend = network = None
+        try:
+            # Ultralytics builds its predictor (and AutoBackend) on the first call.
+            self.predict(warmup)
+            backend = self.model.predictor.model
+            network = backend.model
+            backend.model = torch.compile(network, mode="reduce-overhead")
+            # Batches are padded to one shape so the compiled graph is reused.
+            self.fixed_batch_size = self.batch_size
+            self.predict(warmup)
+            _compiled_models[key] = self.model
+            log.info("Compiled the model in %.1fs.", time.time() - start_time)
+        except Exception as e:
+            if network is not None:
+                backend.model = network
+            self.fixed_batch_size = None
+            log.warning("torch.compile unavailable, running the model eagerly: %s", e)
+
     def run(self):
         if not self.model:
             self.log_message.emit("Detection cannot start. Model not loaded.")
@@ -40,7 +182,14 @@ class DetectionThread(QThread):
 
         self.running = True
 
-        if isinstance(self.source, str) and self.source.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.tiff')):
+        is_image = isinstance(self.source, str) and self.source.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.tiff'))
+
+        # A single image is letterboxed to its own shape, so compiling for the
+        # video input shape would not help it.
+        if self.device == "cuda" and not self.load_engine() and not is_image:
+            self.compile_model()
+
+        if is_image:
             self.process_image(self.source)
         else:
             self.process_video()
@@ -52,32 +201,18 @@ class DetectionThread(QThread):
                 self.log_message.emit(f"Error: Could not read image file {image_path}.")
                 return
 
-            frame = cv2.resize(frame, (800, 600))
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            frame = self.preprocess_cpu(frame)
 
-            results = self.model.predict(
-                source=frame_rgb,
-                conf=self.confidence,
-                device=self.device,
-                agnostic_nms=True,
-                verbose=False
-            )
+            results = self.predict([frame])
 
             if not results or len(results) == 0:
                 self.log_message.emit("No detection results found.")
                 return
 
-            annotated_frame = self.annotate_frame(frame_rgb, results[0].boxes)
+            annotated_frame, class_counts = self.annotate_frame(frame, results[0].boxes, bgr=True)
 
-            height, width, channels = annotated_frame.shape
-            qt_image = QImage(
-                annotated_frame.data, width, height,
-                channels * width, QImage.Format_RGB888
-            )
-            pixmap = QPixmap.fromImage(qt_image)
-            self.frame_processed.emit(pixmap)
+            self.frame_processed.emit(annotated_frame, True)
 
-            class_counts = self.count_detections(results[0].boxes)
             self.handle_detections(class_counts)
 
             self.detection_summary.emit({
@@ -89,34 +224,103 @@ class DetectionThread(QThread):
 
         except Exception as e:
             self.log_message.emit(f"Error during image processing: {e}")
-            traceback.print_exc()
+            log.exception("Error during image processing")
 
     def process_video(self):
-        cap = cv2.VideoCapture(self.source)
+        cap = self.open_capture()
 
         if not cap.isOpened():
             self.log_message.emit("Error: Could not open video source.")
             return
 
-        frame_count = 0
+        # Decoding, inference and annotation/emission run as three stages joined
+        # by bounded queues, so decode and Qt work overlap with inference.
+        # Live sources keep at most one batch queued, so each batch holds the
+        # newest frames; files read ahead by two batches.
+        read_q = queue.Queue(maxsize=self.batch_size if self.is_live else 2 * self.batch_size)
+        write_q = queue.Queue(maxsize=4)
+        reader = threading.Thread(target=self.read_frames, args=(cap, read_q), daemon=True)
+        emitter = threading.Thread(target=self.emit_results, args=(write_q,), daemon=True)
+        reader.start()
+        emitter.start()
 
         while self.running:
-            if self.paused:
+            # Pausing holds every stage, so no queued frame is processed until
+            # resume; stop() sets the event to release the waits.
+            self._pause_event.wait()
+            if not self.running:
+                break
+            try:
+                batch = [read_q.get(timeout=0.1)]
+            except queue.Empty:
+                if not reader.is_alive():
+                    break
                 continue
 
+            # Frames are sent to the model in batches of up to batch_size, which
+            # amortizes the per-call inference overhead without waiting for a
+            # full batch when the source is slower than the model.
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(read_q.get_nowait())
+                except queue.Empty:
+                    break
+
+            output = self.predict_batch(batch)
+            while output and self.running:
+                try:
+                    write_q.put(output, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+        reader.join()
+        write_q.put(None)
+        emitter.join()
+        self.log_message.emit("Video source released. Detection thread stopped.")
+
+    def open_capture(self):
+        cap = self.open_source()
+        if self.is_live:
+            # Keep the driver from queueing frames behind the one being read.
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    def open_source(self):
+        if isinstance(self.source, str):
+            # Let FFmpeg decode files and streams on the GPU (NVDEC, VA-API,
+            # D3D11, ...) where available; OpenCV falls back to software decoding.
+            cap = cv2.VideoCapture(
+                self.source, cv2.CAP_FFMPEG,
+                [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+            )
+            if cap.isOpened():
+                return cap
+            cap.release()
+        return cv2.VideoCapture(self.source)
+
+    def read_frames(self, cap, read_q):
+        frame_count = 0
+
+        while self.running:
+            # Sleeps while paused; stop() sets the event so this cannot hang shutdown.
+            self._pause_event.wait()
+            if not self.running:
+                break
+
             ret, frame = cap.read()
             if not ret:
                 self.log_message.emit("End of video or failed to grab frame.")
                 if isinstance(self.source, str):  # If it's a video file, restart it
                     cap.release()
-                    cap = cv2.VideoCapture(self.source)
+                    cap = self.open_capture()
                     if not cap.isOpened():
                         self.log_message.emit("Error: Could not reopen video source.")
                         break
                     continue
                 else:  # If it's a webcam, try reconnecting
                     cap.release()
-                    cap = cv2.VideoCapture(self.source)
+                    cap = self.open_capture()
                     if not cap.isOpened():
                         self.log_message.emit("Error: Could not reconnect to webcam.")
                         break
@@ -126,137 +330,260 @@ class DetectionThread(QThread):
                 frame_count += 1
                 continue
 
-            try:
-                start_time = time.time()
+            # On CUDA the raw frame is resized on the GPU, see preprocess_gpu().
+            if self.pre_stream is None:
+                frame = self.preprocess_cpu(frame)
+            item = (frame_count, frame)
+            frame_count += 1
 
-                frame = cv2.resize(frame, (800, 600))
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            while self.running:
+                try:
+                    if self.is_live:
+                        read_q.put_nowait(item)
+                    else:
+                        read_q.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    if self.is_live:
+                        # Inference is behind; drop the oldest frame so the
+                        # model always sees the most recent ones.
+                        try:
+                            read_q.get_nowait()
+                        except queue.Empty:
+                            pass
 
-                results = self.model.predict(
-                    source=frame_rgb,
-                    conf=self.confidence,
-                    device=self.device,
-                    agnostic_nms=True,
-                    verbose=False
-                )
+        cap.release()
 
-                if not results or len(results) == 0:
-                    self.log_message.emit("No detection results found.")
-                    continue
+    def predict_batch(self, batch):
+        try:
+            start_time = time.perf_counter_ns()
+
+            frame_indices = [frame_count for frame_count, _ in batch]
+            frames = [frame for _, frame in batch]
+            if self.pre_stream is not None:
+                results = self.predict(self.preprocess_gpu(frames))
+                # For tensor sources Ultralytics returns the (RGB) model input as
+                # orig_img; it doubles as the display frame once the padding rows
+                # are cut off.
+                frames = [result.orig_img[:600] for result in results]
+                bgr = False
+            else:
+                # Ultralytics expects OpenCV's BGR order for arrays and swaps
+                # channels itself; the frames are displayed as BGR too.
+                results = self.predict(frames)
+                bgr = True
+
+            if not results or len(results) == 0:
+                self.log_message.emit("No detection results found.")
+                return None
+
+            inference_time_ns = (time.perf_counter_ns() - start_time) // len(frame_indices)
+            return frame_indices, frames, results, inference_time_ns, bgr
+
+        except Exception as e:
+            self.log_message.emit(f"Error during detection: {e}")
+            log.exception("Error during detection")
+            return None
+
+    def preprocess_cpu(self, frame):
+        if self.use_opencl:
+            return cv2.resize(cv2.UMat(frame), (800, 600)).get()
+        return cv2.resize(frame, (800, 600))
+
+    def preprocess_gpu(self, frames):
+        # Raw BGR frames go up through a pinned buffer; resize, BGR->RGB,
+        # HWC->CHW and scaling to [0, 1] then run on a side stream.
+        shape = frames[0].shape
+        if self.pinned is None or self.pinned.shape[1:] != shape:
+            self.pinned = torch.empty((self.batch_size,) + shape, dtype=torch.uint8, pin_memory=True)
+        host = self.pinned[:len(frames)]
+        host_frames = host.numpy()
+        for i, frame in enumerate(frames):
+            host_frames[i] = frame
+
+        with torch.cuda.stream(self.pre_stream):
+            gpu = host.to(self.device, non_blocking=True)
+            gpu = gpu[..., [2, 1, 0]].permute(0, 3, 1, 2).float().div_(255.0)
+            gpu = F.interpolate(gpu, size=(600, 800), mode="bilinear", align_corners=False)
+            # Pad to MODEL_IMGSZ at the bottom only, so box coordinates stay
+            # those of the 800x600 display frame.
+            gpu = F.pad(gpu, (0, 0, 0, MODEL_IMGSZ[0] - 600), value=114 / 255.0)
+
+        torch.cuda.current_stream().wait_stream(self.pre_stream)
+        gpu.record_stream(torch.cuda.current_stream())
+        return gpu
+
+    def predict(self, frames):
+        # The engine and the compiled model only take full batches, so pad with
+        # the last frame; the extra results are dropped.
+        count = len(frames)
+        if self.fixed_batch_size and count < self.fixed_batch_size:
+            pad = self.fixed_batch_size - count
+            if isinstance(frames, torch.Tensor):
+                frames = torch.cat([frames, frames[-1:].expand(pad, -1, -1, -1)])
+            else:
+                frames = frames + [frames[-1]] * pad
+        # Grad mode is thread-local, so it is switched off here on the calling
+        # thread rather than once in __init__.
+        with torch.inference_mode():
+            return self.model.predict(source=frames, **self.predict_args)[:count]
+
+    def emit_results(self, write_q):
+        window_frames = 0
+        window_time_ns = 0
+        window_counts = dict.fromkeys(self.class_names, 0)
+        frame_count = 0
+
+        while True:
+            output = write_q.get()
+            if output is None:
+                break
+            # After stop() the remaining batches are discarded, so no results
+            # reach the UI, the database or the Arduino once detection is stopped.
+            if not self.running:
+                continue
+
+            frame_indices, frames, results, inference_time_ns, bgr = output
+            try:
+                for frame_count, frame, result in zip(frame_indices, frames, results):
+                    self._pause_event.wait()
+                    if not self.running:
+                        break
+                    frame_start = time.perf_counter_ns()
+
+                    annotated_frame, class_counts = self.annotate_frame(frame, result.boxes, bgr)
 
-                annotated_frame = self.annotate_frame(frame_rgb, results[0].boxes)
+                    self.frame_processed.emit(annotated_frame, bgr)
 
-                height, width, channels = annotated_frame.shape
-                qt_image = QImage(
-                    annotated_frame.data, width, height,
-                    channels * width, QImage.Format_RGB888
-                )
-                pixmap = QPixmap.fromImage(qt_image)
-                self.frame_processed.emit(pixmap)
+                    self.handle_detections(class_counts)
 
-                class_counts = self.count_detections(results[0].boxes)
-                self.handle_detections(class_counts)
+                    window_time_ns += inference_time_ns + time.perf_counter_ns() - frame_start
+                    window_frames += 1
+                    for name, count in class_counts.items():
+                        window_counts[name] += count
 
-                elapsed_time = time.time() - start_time
-                self.detection_summary.emit({
-                    "frame_count": frame_count,
-                    "objects_detected": sum(class_counts.values()),
-                    "processing_time": elapsed_time,
-                    **class_counts
-                })
+                    if window_frames == SUMMARY_INTERVAL:
+                        self.emit_summary(frame_count, window_frames, window_time_ns, window_counts)
+                        window_frames = window_time_ns = 0
+                        window_counts = dict.fromkeys(self.class_names, 0)
 
             except Exception as e:
                 self.log_message.emit(f"Error during detection: {e}")
-                traceback.print_exc()
+                log.exception("Error during detection")
 
-            frame_count += 1
+        if window_frames:
+            self.emit_summary(frame_count, window_frames, window_time_ns, window_counts)
 
-        cap.release()
-        self.log_message.emit("Video source released. Detection thread stopped.")
+    def emit_summary(self, frame_count, frames, time_ns, class_counts):
+        # processing_time is the average per frame over the window, in seconds.
+        self.detection_summary.emit({
+            "frame_count": frame_count,
+            "objects_detected": sum(class_counts.values()),
+            "processing_time": time_ns / frames / 1e9,
+            **class_counts
+        })
 
-    def annotate_frame(self, frame, boxes):
+    def annotate_frame(self, frame, boxes, bgr=False):
         if self.line_y_position is None:
             self.line_y_position = int(frame.shape[0] * 0.35)
 
-        cv2.line(frame, (0, self.line_y_position), (frame.shape[1], self.line_y_position), (0, 255, 255), 2)
-        current_frame_objects = {}
+        line_color = LINE_COLOR[::-1] if bgr else LINE_COLOR
+        cv2.line(frame, (0, self.line_y_position), (frame.shape[1], self.line_y_position), line_color, 2)
+
+        if len(boxes) == 0:
+            self._track_ids = self._track_y2 = np.empty(0, dtype=np.int32)
+            return frame, dict.fromkeys(self.class_names, 0)
 
-        class_names = ["Damaged-Open", "Damaged-Deformed", "Intact"]
-        colors = [(255, 0, 0), (0, 0, 255), (0, 255, 0)]
+        # One device-to-host copy per tensor instead of three per box.
+        xyxy = boxes.xyxy.cpu().numpy().astype(np.int32)
+        confs = boxes.conf.cpu().numpy()
+        clss = boxes.cls.cpu().numpy().astype(np.int32)
 
-        for box in boxes:
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
-            confidence = float(box.conf[0])
-            cls = int(box.cls[0])
+        counts = np.bincount(clss, minlength=len(self.class_names)).tolist()
+        class_counts = dict(zip(self.class_names, counts))
 
-            if cls >= len(class_names):
+        for (x1, y1, x2, y2), confidence, cls in zip(xyxy.tolist(), confs.tolist(), clss.tolist()):
+            if cls >= len(self.class_names):
                 continue
 
-            label = class_names[cls]
-            color = colors[cls]
+            label = self.class_names[cls]
+            color = self.colors[cls][::-1] if bgr else self.colors[cls]
             display_text = f"{label}: {confidence:.2f}"
 
             cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
 
-            (text_width, text_height), _ = cv2.getTextSize(display_text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+            text_width, text_height = self._label_sizes[label]
             cv2.rectangle(frame, (x1, y1 - text_height - 10), (x1 + text_width, y1), color, -1)
 
             cv2.putText(
                 frame, display_text, (x1, y1 - 5),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1
+                FONT, 0.5, (255, 255, 255), 1
             )
 
-            object_id = (x1 + x2) // 2
-            current_frame_objects[object_id] = y2
-
-            if object_id in self.tracked_objects:
-                if self.tracked_objects[object_id] < self.line_y_position <= y2:
-                    self.tracked_objects[object_id] = y2
-                    self.log_message.emit(f"{label} object crossed the line.")
-                    self.detection_result.emit(label)
-            else:
-                self.tracked_objects[object_id] = y2
-
-        self.tracked_objects = {
-            obj_id: y2 for obj_id, y2 in self.tracked_objects.items()
-            if obj_id in current_frame_objects
-        }
-
-        return frame
-
-    def count_detections(self, boxes):
-        counts = {"Intact": 0, "Damaged-Deformed": 0, "Damaged-Open": 0}
-        for box in boxes:
-            cls = int(box.cls[0])
-            if cls == 2:
-                counts["Intact"] += 1
-            elif cls == 1:
-                counts["Damaged-Deformed"] += 1
-            elif cls == 0:
-                counts["Damaged-Open"] += 1
-        return counts
+        crossed = self.track_crossings(xyxy, clss)
+        if crossed:
+            self.detection_result.emit(crossed)
+
+        return frame, class_counts
+
+    def track_crossings(self, xyxy, clss):
+        keep = clss < len(self.class_names)
+        xyxy, clss = xyxy[keep], clss[keep]
+        ids = (xyxy[:, 0] + xyxy[:, 2]) // 2
+        y2s = xyxy[:, 3]
+
+        # Match this frame's objects to the previous frame's by center x.
+        known = np.zeros(len(ids), dtype=bool)
+        prev_y2 = y2s.copy()
+        if len(self._track_ids):
+            pos = np.minimum(np.searchsorted(self._track_ids, ids), len(self._track_ids) - 1)
+            known = self._track_ids[pos] == ids
+            prev_y2[known] = self._track_y2[pos[known]]
+
+        line = self.line_y_position
+        crossed_mask = known & (prev_y2 < line) & (y2s >= line)
+        prev_y2[crossed_mask] = y2s[crossed_mask]
+
+        # Objects missing from this frame are forgotten.
+        self._track_ids, first = np.unique(ids, return_index=True)
+        self._track_y2 = prev_y2[first]
+
+        crossed = {}
+        for cls in clss[crossed_mask].tolist():
+            label = self.class_names[cls]
+            self.log_message.emit(f"{label} object crossed the line.")
+            crossed[label] = crossed.get(label, 0) + 1
+        return crossed
 
     def handle_detections(self, class_counts):
-        defective_count = class_counts["Damaged-Deformed"] + class_counts["Damaged-Open"]
+        defective_count = class_counts.get("Damaged-Deformed", 0) + class_counts.get("Damaged-Open", 0)
 
         if defective_count > 0:
             self.consecutive_damaged_count += defective_count
             if self.consecutive_damaged_count >= 10:
                 self.warning_signal.emit("Warning: 10 consecutive defective items detected. Pausing detection.")
                 self.pause_trigger.emit("paused")
-                self.paused = True
+                self._pause_event.clear()
                 self.consecutive_damaged_count = 0  # Reset the count after triggering the warning
         else:
             self.consecutive_damaged_count = 0
 
-        for cls, count in class_counts.items():
-            for _ in range(count):
-                self.detection_result.emit(cls)
+        # One signal per frame rather than one per object.
+        if any(class_counts.values()):
+            self.detection_result.emit(class_counts)
+
+    @property
+    def paused(self):
+        return not self._pause_event.is_set()
 
     def stop(self):
         self.running = False
+        self._pause_event.set()
         self.wait()
 
     def toggle_pause(self):
-        self.paused = not self.paused
+        if self.paused:
+            self._pause_event.set()
+        else:
+            self._pause_event.clear()
         self.log_message.emit(f"Detection thread {'paused' if self.paused else 'resumed'}.")
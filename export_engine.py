@@ -0,0 +1,15 @@
+import argparse
+import logging
+from detection import export_engine
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the TensorRT engine used for detection on CUDA GPUs.")
+    parser.add_argument("model_path", nargs="?", default="models/best.pt")
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+    print(f"Engine saved to {export_engine(args.model_path, args.batch_size)}")
+
+if __name__ == "__main__":
+    main()